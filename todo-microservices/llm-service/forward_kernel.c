@@ -0,0 +1,208 @@
+/*
+ * Fixed-point transformer kernels for `forward_reference.py --native`.
+ *
+ * The model shapes are compile-time constants (-DN_EMBD, -DN_HEAD, -DHIDDEN_DIM),
+ * so every inner loop has a fixed trip count the compiler can unroll and
+ * vectorize. forward_reference.py builds one shared library per shape.
+ *
+ * Same math as the Numba kernels, operation for operation. C division truncates,
+ * Python's // floors, so every division goes through fdiv() to keep the logits
+ * identical to the NumPy path.
+ */
+
+#include <stdint.h>
+
+#if !defined(N_EMBD) || !defined(N_HEAD) || !defined(HIDDEN_DIM)
+#error "compile with -DN_EMBD=<n_embd> -DN_HEAD=<n_head> -DHIDDEN_DIM=<hidden_dim>"
+#endif
+
+#define HEAD_DIM (N_EMBD / N_HEAD)
+#define QKV_DIM (3 * N_EMBD)
+#define SCALE 10000LL
+#define EXP_LIMIT (8 * SCALE)
+
+static inline int64_t fdiv(int64_t a, int64_t b) {
+    int64_t q = a / b;
+    return (a % b != 0 && ((a < 0) != (b < 0))) ? q - 1 : q;
+}
+
+/* Fixed-point math (matching AWK/bash) */
+
+static int64_t fp_exp(int64_t x) {
+    if (x > EXP_LIMIT) x = EXP_LIMIT;
+    if (x < -EXP_LIMIT) return 0;
+
+    int neg = x < 0;
+    if (neg) x = -x;
+
+    int64_t result = SCALE;
+    int64_t term = SCALE;
+    for (int64_t i = 1; i <= 15; i++) {
+        term = fdiv(term * x, i * SCALE);
+        result += term;
+        if (term < 1) break;
+    }
+
+    if (neg) {
+        if (result == 0) return 0;
+        result = fdiv(SCALE * SCALE, result);
+    }
+    return result;
+}
+
+static int64_t fp_sqrt(int64_t x) {
+    if (x <= 0) return 0;
+
+    int64_t guess = fdiv(x, 2);
+    if (guess < SCALE) guess = SCALE;
+
+    for (int i = 0; i < 20; i++) {
+        int64_t prev = guess;
+        int64_t div = fdiv(x * SCALE, guess);
+        guess = fdiv(guess + div, 2);
+        int64_t diff = guess - prev;
+        if (diff < 0) diff = -diff;
+        if (diff < 2) break;
+    }
+    return guess;
+}
+
+static int64_t fp_tanh(int64_t x) {
+    if (x > 4 * SCALE) return SCALE;
+    if (x < -4 * SCALE) return -SCALE;
+
+    int64_t exp_2x = fp_exp(2 * x);
+    int64_t denom = exp_2x + SCALE;
+    if (denom == 0) return SCALE;
+    return fdiv((exp_2x - SCALE) * SCALE, denom);
+}
+
+static int64_t fp_gelu(int64_t x) {
+    const int64_t sqrt_2_pi = 7979;
+    const int64_t coeff = 447;
+
+    int64_t x_sq = fdiv(x * x, SCALE);
+    int64_t x_cu = fdiv(x_sq * x, SCALE);
+    int64_t inner = x + fdiv(coeff * x_cu, SCALE);
+    inner = fdiv(sqrt_2_pi * inner, SCALE);
+    int64_t half_term = fdiv(SCALE + fp_tanh(inner), 2);
+    return fdiv(x * half_term, SCALE);
+}
+
+/* Building blocks, fully specialized on the compile-time shapes */
+
+static inline int64_t dot_head(const int64_t *q, const int64_t *k) {
+    int64_t sum = 0;
+    for (int d = 0; d < HEAD_DIM; d++) {
+        sum += fdiv(q[d] * k[d], SCALE);
+    }
+    return sum;
+}
+
+static inline void linear(const int64_t *x, const int64_t *w, const int64_t *b, int64_t *out,
+                          int64_t seq_len, const int n_in, const int n_out) {
+    for (int64_t t = 0; t < seq_len; t++) {
+        const int64_t *x_row = x + t * n_in;
+        int64_t *out_row = out + t * n_out;
+        for (int i = 0; i < n_out; i++) out_row[i] = b[i];
+        for (int j = 0; j < n_in; j++) {
+            const int64_t x_j = x_row[j];
+            const int64_t *w_row = w + (int64_t)j * n_out;
+            for (int i = 0; i < n_out; i++) {
+                out_row[i] += fdiv(x_j * w_row[i], SCALE);
+            }
+        }
+    }
+}
+
+/* Exported kernels: same contracts as the nb_* kernels in forward_numba.py */
+
+void add_layer_norm(int64_t *hidden, const int64_t *pending, const int64_t *gamma, const int64_t *beta,
+                    int64_t *out, int64_t seq_len) {
+    for (int64_t t = 0; t < seq_len; t++) {
+        int64_t *row = hidden + t * N_EMBD;
+        const int64_t *add = pending + t * N_EMBD;
+        int64_t *out_row = out + t * N_EMBD;
+
+        int64_t total = 0;
+        for (int i = 0; i < N_EMBD; i++) {
+            row[i] += add[i];
+            total += row[i];
+        }
+        int64_t mean = fdiv(total, N_EMBD);
+
+        int64_t var_sum = 0;
+        for (int i = 0; i < N_EMBD; i++) {
+            int64_t diff = row[i] - mean;
+            var_sum += fdiv(diff * diff, SCALE);
+        }
+
+        int64_t std = fp_sqrt(fdiv(var_sum, N_EMBD) + 100);
+        if (std < 100) std = 100;
+
+        for (int i = 0; i < N_EMBD; i++) {
+            int64_t normalized = fdiv((row[i] - mean) * SCALE, std);
+            out_row[i] = fdiv(normalized * gamma[i], SCALE) + beta[i];
+        }
+    }
+}
+
+void linear_qkv(const int64_t *x, const int64_t *w, const int64_t *b, int64_t *out, int64_t seq_len) {
+    linear(x, w, b, out, seq_len, N_EMBD, QKV_DIM);
+}
+
+void linear_proj(const int64_t *x, const int64_t *w, const int64_t *b, int64_t *out, int64_t seq_len) {
+    linear(x, w, b, out, seq_len, N_EMBD, N_EMBD);
+}
+
+void attention(const int64_t *qkv, int64_t seq_len, int64_t scale, const int64_t *exp_table,
+               int64_t q_start, int64_t *out) {
+    int64_t probs[seq_len];
+
+    for (int h = 0; h < N_HEAD; h++) {
+        const int q_off = h * HEAD_DIM;
+        const int k_off = N_EMBD + q_off;
+        const int v_off = 2 * N_EMBD + q_off;
+
+        for (int64_t i = q_start; i < seq_len; i++) {
+            /* Scores for keys 0..i only: masked keys would get fp_exp(MASK - max) = 0 */
+            const int64_t *q = qkv + i * QKV_DIM + q_off;
+            int64_t max_val = 0;
+            for (int64_t j = 0; j <= i; j++) {
+                int64_t score = fdiv(dot_head(q, qkv + j * QKV_DIM + k_off) * SCALE, scale);
+                probs[j] = score;
+                if (j == 0 || score > max_val) max_val = score;
+            }
+
+            /* Softmax */
+            int64_t total = 0;
+            for (int64_t j = 0; j <= i; j++) {
+                int64_t shifted = probs[j] - max_val;
+                probs[j] = shifted >= -EXP_LIMIT ? exp_table[shifted + EXP_LIMIT] : 0;
+                total += probs[j];
+            }
+            for (int64_t j = 0; j <= i; j++) {
+                probs[j] = fdiv(probs[j] * SCALE, total);
+            }
+
+            /* Apply to values */
+            int64_t *out_row = out + (i - q_start) * N_EMBD + q_off;
+            for (int d = 0; d < HEAD_DIM; d++) out_row[d] = 0;
+            for (int64_t j = 0; j <= i; j++) {
+                const int64_t *v = qkv + j * QKV_DIM + v_off;
+                for (int d = 0; d < HEAD_DIM; d++) {
+                    out_row[d] += fdiv(probs[j] * v[d], SCALE);
+                }
+            }
+        }
+    }
+}
+
+void feed_forward(const int64_t *x, const int64_t *fc1_w, const int64_t *fc1_b, const int64_t *fc2_w,
+                  const int64_t *fc2_b, int64_t *intermediate, int64_t *out, int64_t seq_len) {
+    linear(x, fc1_w, fc1_b, intermediate, seq_len, N_EMBD, HIDDEN_DIM);
+    for (int64_t k = 0; k < seq_len * HIDDEN_DIM; k++) {
+        intermediate[k] = fp_gelu(intermediate[k]);
+    }
+    linear(intermediate, fc2_w, fc2_b, out, seq_len, HIDDEN_DIM, N_EMBD);
+}
@@ -0,0 +1,220 @@
+"""
+Numba kernels for `forward_reference.py --numba`.
+
+The same fixed-point forward pass as fused loop nests over preallocated int64
+buffers. Weights are passed unpacked (no dicts in nopython mode).
+
+Lives in its own module so the NumPy path never imports numba: forward_reference.py
+only loads this for --numba. The scalar helpers are nopython copies of the ones
+in forward_reference.py, operation for operation (like forward_kernel.c).
+
+Requirements:
+    pip install numba
+"""
+
+import numpy as np
+from numba import njit, prange
+
+SCALE = 10000
+
+
+# Fixed-point math (matching AWK/bash)
+
+@njit(cache=True)
+def fp_exp(x):
+    """Fixed-point exponential."""
+    if x > 8 * SCALE:
+        x = 8 * SCALE
+    if x < -8 * SCALE:
+        return 0
+
+    neg = False
+    if x < 0:
+        neg = True
+        x = -x
+
+    result = SCALE
+    term = SCALE
+
+    for i in range(1, 16):
+        term = (term * x) // (i * SCALE)
+        result += term
+        if term < 1:
+            break
+
+    if neg:
+        if result == 0:
+            return 0
+        result = (SCALE * SCALE) // result
+
+    return result
+
+
+@njit(cache=True)
+def fp_sqrt(x):
+    """Fixed-point square root via Newton's method."""
+    if x <= 0:
+        return 0
+
+    guess = x // 2
+    if guess < SCALE:
+        guess = SCALE
+
+    for _ in range(20):
+        prev = guess
+        div = (x * SCALE) // guess
+        guess = (guess + div) // 2
+        diff = guess - prev
+        if diff < 0:
+            diff = -diff
+        if diff < 2:
+            break
+
+    return guess
+
+
+@njit(cache=True)
+def fp_tanh(x):
+    """Fixed-point tanh."""
+    if x > 4 * SCALE:
+        return SCALE
+    if x < -4 * SCALE:
+        return -SCALE
+
+    exp_2x = fp_exp(2 * x)
+    num = exp_2x - SCALE
+    denom = exp_2x + SCALE
+
+    if denom == 0:
+        return SCALE
+
+    return (num * SCALE) // denom
+
+
+@njit(cache=True)
+def fp_gelu(x):
+    """Fixed-point GELU activation."""
+    sqrt_2_pi = 7979
+    coeff = 447
+
+    x_sq = (x * x) // SCALE
+    x_cu = (x_sq * x) // SCALE
+    cubic_term = (coeff * x_cu) // SCALE
+    inner = x + cubic_term
+    inner = (sqrt_2_pi * inner) // SCALE
+    tanh_val = fp_tanh(inner)
+    half_term = (SCALE + tanh_val) // 2
+
+    return (x * half_term) // SCALE
+
+
+# Kernels: same contracts as the exported functions in forward_kernel.c
+
+@njit(cache=True, parallel=True)
+def nb_add_layer_norm(hidden, pending, gamma, beta, out):
+    """hidden += pending, then row-wise layer_norm of hidden into out, in one pass per row."""
+    seq_len, n = hidden.shape
+    for t in prange(seq_len):
+        total = 0
+        for i in range(n):
+            hidden[t, i] += pending[t, i]
+            total += hidden[t, i]
+        mean = total // n
+
+        var_sum = 0
+        for i in range(n):
+            diff = hidden[t, i] - mean
+            var_sum += (diff * diff) // SCALE
+
+        std = fp_sqrt(var_sum // n + 100)
+        if std < 100:
+            std = 100
+
+        for i in range(n):
+            normalized = ((hidden[t, i] - mean) * SCALE) // std
+            out[t, i] = (normalized * gamma[i]) // SCALE + beta[i]
+
+
+@njit(cache=True, parallel=True)
+def nb_linear(x, w, b, out):
+    """out = x @ w + b, rescaling every product like fp_matmul."""
+    seq_len, n_in = x.shape
+    n_out = w.shape[1]
+    for t in prange(seq_len):
+        for i in range(n_out):
+            out[t, i] = b[i]
+        for j in range(n_in):
+            x_j = x[t, j]
+            for i in range(n_out):
+                out[t, i] += (x_j * w[j, i]) // SCALE
+
+
+@njit(cache=True, parallel=True)
+def nb_attention(qkv, n_head, scale, exp_table, q_start, out):
+    """Causal multi-head attention from packed qkv[seq_len, 3*n_embd] into out[seq_len - q_start, n_embd].
+
+    Only queries q_start.. are computed. exp_table is EXP_TABLE, passed in
+    rather than frozen into the compiled kernel.
+    """
+    seq_len = qkv.shape[0]
+    n_embd = out.shape[1]
+    head_dim = n_embd // n_head
+    for h in prange(n_head):
+        q_off = h * head_dim
+        k_off = n_embd + q_off
+        v_off = 2 * n_embd + q_off
+        probs = np.empty(seq_len, dtype=np.int64)
+
+        for i in range(q_start, seq_len):
+            # Scores for keys 0..i only: masked keys would get fp_exp(MASK - max) = 0
+            max_val = 0
+            for j in range(i + 1):
+                score = 0
+                for d in range(head_dim):
+                    score += (qkv[i, q_off + d] * qkv[j, k_off + d]) // SCALE
+                score = (score * SCALE) // scale
+                probs[j] = score
+                if j == 0 or score > max_val:
+                    max_val = score
+
+            # Softmax
+            total = 0
+            for j in range(i + 1):
+                shifted = probs[j] - max_val
+                probs[j] = exp_table[shifted + 8 * SCALE] if shifted >= -8 * SCALE else 0
+                total += probs[j]
+            for j in range(i + 1):
+                probs[j] = (probs[j] * SCALE) // total
+
+            # Apply to values
+            for d in range(head_dim):
+                attn_sum = 0
+                for j in range(i + 1):
+                    attn_sum += (probs[j] * qkv[j, v_off + d]) // SCALE
+                out[i - q_start, q_off + d] = attn_sum
+
+
+@njit(cache=True, parallel=True)
+def nb_feed_forward(x, fc1_w, fc1_b, fc2_w, fc2_b, intermediate, out):
+    """FC1 + GELU + FC2 per position, using intermediate[seq_len, hidden_dim] as scratch."""
+    seq_len, n_embd = x.shape
+    hidden_dim = fc1_w.shape[1]
+    for t in prange(seq_len):
+        for i in range(hidden_dim):
+            intermediate[t, i] = fc1_b[i]
+        for j in range(n_embd):
+            x_j = x[t, j]
+            for i in range(hidden_dim):
+                intermediate[t, i] += (x_j * fc1_w[j, i]) // SCALE
+        for i in range(hidden_dim):
+            intermediate[t, i] = fp_gelu(intermediate[t, i])
+
+        for i in range(n_embd):
+            out[t, i] = fc2_b[i]
+        for j in range(hidden_dim):
+            h_j = intermediate[t, j]
+            for i in range(n_embd):
+                out[t, i] += (h_j * fc2_w[j, i]) // SCALE
+
+
+NUMBA_KERNELS = (nb_add_layer_norm, nb_linear, nb_attention, nb_feed_forward)
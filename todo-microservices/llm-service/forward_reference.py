@@ -5,17 +5,35 @@ For comparing against the AWK version that exists for reasons we don't discuss i
 
 Usage:
     python forward_reference.py --model-dir model --tokens "72 101 108 108 111"
+    python forward_reference.py --model-dir model --check   # every exact backend vs forward()
 
 Outputs logits in the same fixed-point format as the AWK version.
+
+Requirements:
+    pip install numpy
+    pip install numba   # optional, for --numba (--fast needs only NumPy)
+    a C compiler        # optional, for --native (cc, or $CC)
 """
 
 import argparse
+import ctypes
+import functools
 import math
 import os
+import subprocess
+import sys
 from pathlib import Path
 
+import numpy as np
 
 SCALE = 10000
+MASK = -1000000000
+
+# Query rows per attention tile
+ATTN_TILE = 16
+
+# Max elements in fp_matmul's broadcast temporary (8 MB of int64)
+MATMUL_CHUNK = 1 << 20
 
 
 def load_config(model_dir: Path) -> dict:
@@ -35,25 +53,48 @@ def load_config(model_dir: Path) -> dict:
     return config
 
 
-def load_weights(filepath: Path) -> list[int]:
-    """Load weights from file."""
-    weights = []
-    with open(filepath) as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                weights.append(int(line))
+def load_weights(filepath: Path) -> np.ndarray:
+    """Load weights from file as a flat int64 array.
+
+    The parsed array is cached as a .npy next to the text file, stamped with
+    the text file's mtime. It is reused only while the two mtimes match
+    exactly, so a replacement with an older mtime (tar x, cp -p) is re-parsed.
+    """
+    cache = filepath.with_suffix(".npy")
+    source = filepath.stat()
+    try:
+        if cache.stat().st_mtime_ns == source.st_mtime_ns:
+            return np.load(cache)
+    except (OSError, ValueError, EOFError):
+        pass
+
+    weights = np.loadtxt(filepath, dtype=np.int64, ndmin=1)
+    # Write under a private name and rename into place, so a concurrent run
+    # never loads a half-written cache
+    tmp_path = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, weights)
+        os.utime(tmp_path, ns=(source.st_atime_ns, source.st_mtime_ns))
+        os.replace(tmp_path, cache)
+    except OSError:
+        pass  # read-only model dir: just parse again next time
+    finally:
+        tmp_path.unlink(missing_ok=True)
     return weights
 
 
 def load_model(model_dir: Path) -> tuple[dict, dict]:
-    """Load all model weights."""
+    """Load all model weights, with matrices reshaped to [in, out]."""
     config = load_config(model_dir)
     weights = {}
 
+    n_embd = config["n_embd"]
+    hidden_dim = config["hidden_dim"]
+
     # Token and position embeddings
-    weights["wte"] = load_weights(model_dir / "wte.txt")
-    weights["wpe"] = load_weights(model_dir / "wpe.txt")
+    weights["wte"] = load_weights(model_dir / "wte.txt").reshape(config["vocab_size"], n_embd)
+    weights["wpe"] = load_weights(model_dir / "wpe.txt").reshape(config["block_size"], n_embd)
 
     # Final layer norm
     weights["ln_f_w"] = load_weights(model_dir / "ln_f_weight.txt")
@@ -66,24 +107,50 @@ def load_model(model_dir: Path) -> tuple[dict, dict]:
         weights[f"ln1_w_{layer}"] = load_weights(prefix / "ln1_weight.txt")
         weights[f"ln1_b_{layer}"] = load_weights(prefix / "ln1_bias.txt")
 
-        weights[f"attn_w_{layer}"] = load_weights(prefix / "attn_weight.txt")
+        weights[f"attn_w_{layer}"] = load_weights(prefix / "attn_weight.txt").reshape(n_embd, 3 * n_embd)
         weights[f"attn_b_{layer}"] = load_weights(prefix / "attn_bias.txt")
 
-        weights[f"attn_proj_w_{layer}"] = load_weights(prefix / "attn_proj_weight.txt")
+        weights[f"attn_proj_w_{layer}"] = load_weights(prefix / "attn_proj_weight.txt").reshape(n_embd, n_embd)
         weights[f"attn_proj_b_{layer}"] = load_weights(prefix / "attn_proj_bias.txt")
 
         weights[f"ln2_w_{layer}"] = load_weights(prefix / "ln2_weight.txt")
         weights[f"ln2_b_{layer}"] = load_weights(prefix / "ln2_bias.txt")
 
-        weights[f"ffn_fc1_w_{layer}"] = load_weights(prefix / "ffn_fc1_weight.txt")
+        weights[f"ffn_fc1_w_{layer}"] = load_weights(prefix / "ffn_fc1_weight.txt").reshape(n_embd, hidden_dim)
         weights[f"ffn_fc1_b_{layer}"] = load_weights(prefix / "ffn_fc1_bias.txt")
 
-        weights[f"ffn_fc2_w_{layer}"] = load_weights(prefix / "ffn_fc2_weight.txt")
+        weights[f"ffn_fc2_w_{layer}"] = load_weights(prefix / "ffn_fc2_weight.txt").reshape(hidden_dim, n_embd)
         weights[f"ffn_fc2_b_{layer}"] = load_weights(prefix / "ffn_fc2_bias.txt")
 
     return config, weights
 
 
+@functools.lru_cache
+def causal_mask(block_size: int) -> np.ndarray:
+    """Causal mask: True where key j comes after query i. Built once per block_size."""
+    mask = np.triu(np.ones((block_size, block_size), dtype=bool), k=1)
+    mask.flags.writeable = False
+    return mask
+
+
+def quantize_weights(weights: dict, config: dict) -> dict:
+    """Copy of weights with the block matrices stored as int8, one scale per output column.
+
+    Each column is W ~= W_q * scale / SCALE, with scale kept as a fixed-point int32.
+    The embeddings stay int64 (they feed the residual stream directly).
+    This is lossy: logits drift from the AWK version.
+    """
+    quantized = dict(weights)
+    for layer in range(config["n_layer"]):
+        for name in (f"attn_w_{layer}", f"attn_proj_w_{layer}", f"ffn_fc1_w_{layer}", f"ffn_fc2_w_{layer}"):
+            w = weights[name]
+            # Round the scale up so |W_q| never exceeds 127
+            scale = np.maximum((np.abs(w).max(axis=0) * SCALE + 126) // 127, 1)
+            quantized[name] = np.rint(w * SCALE / scale).astype(np.int8)
+            quantized[f"{name}_scale"] = scale.astype(np.int32)
+    return quantized
+
+
 # Fixed-point math (matching AWK/bash)
 
 def fp_exp(x: int) -> int:
@@ -168,208 +235,262 @@ def fp_gelu(x: int) -> int:
     return (x * half_term) // SCALE
 
 
-def fp_softmax(arr: list[int]) -> list[int]:
-    """Fixed-point softmax."""
-    max_val = max(arr)
+# Elementwise versions of the above, for whole rows/matrices at once
 
-    exps = []
-    total = 0
-    for x in arr:
-        shifted = x - max_val
-        e = fp_exp(shifted)
-        exps.append(e)
-        total += e
+def fp_exp_taylor_vec(x: np.ndarray) -> np.ndarray:
+    """Elementwise fp_exp, evaluated with the Taylor series.
 
-    result = []
-    for e in exps:
-        if total > 0:
-            result.append((e * SCALE) // total)
-        else:
-            result.append(SCALE // len(arr))
+    Always runs the 15 Taylor terms: once a term floors to 0 every later term
+    is 0 too, so this gives the same result as the scalar early break.
+    """
+    x = np.asarray(x, dtype=np.int64)
+    underflow = x < -8 * SCALE
+    neg = x < 0
+    x = np.abs(np.clip(x, -8 * SCALE, 8 * SCALE))
+
+    result = np.full(x.shape, SCALE, dtype=np.int64)
+    term = result.copy()
+    for i in range(1, 16):
+        term = (term * x) // (i * SCALE)
+        result += term
 
+    result = np.where(neg, (SCALE * SCALE) // result, result)
+    result[underflow] = 0
     return result
 
 
-def layer_norm(inp: list[int], gamma: list[int], beta: list[int]) -> list[int]:
-    """Layer normalization."""
-    n = len(inp)
+# fp_exp(x) for every x in [-8*SCALE, 8*SCALE], indexed by x + 8*SCALE (~1.3 MB).
+# fp_exp is clamped outside that range, so a lookup reproduces it exactly.
+EXP_TABLE = fp_exp_taylor_vec(np.arange(-8 * SCALE, 8 * SCALE + 1))
+
+
+def fp_exp_vec(x: np.ndarray) -> np.ndarray:
+    """Elementwise fp_exp, as a lookup into EXP_TABLE."""
+    x = np.asarray(x, dtype=np.int64)
+    result = EXP_TABLE[np.clip(x, -8 * SCALE, 8 * SCALE) + 8 * SCALE]
+    return np.where(x < -8 * SCALE, 0, result)
+
+
+def fp_sqrt_vec(x: np.ndarray) -> np.ndarray:
+    """Elementwise fp_sqrt: the same Newton steps, with converged elements frozen."""
+    x = np.asarray(x, dtype=np.int64)
+    target = x * SCALE
+    guess = np.maximum(x // 2, SCALE)
+    active = x > 0
+
+    for _ in range(20):
+        step = (guess + target // guess) // 2
+        converged = np.abs(step - guess) < 2
+        guess = np.where(active, step, guess)
+        active &= ~converged
+        if not active.any():
+            break
+
+    return np.where(x > 0, guess, 0)
+
+
+def fp_tanh_vec(x: np.ndarray) -> np.ndarray:
+    """Elementwise fp_tanh."""
+    x = np.asarray(x, dtype=np.int64)
+    exp_2x = fp_exp_vec(2 * x)
+    result = ((exp_2x - SCALE) * SCALE) // (exp_2x + SCALE)
+    result = np.where(x > 4 * SCALE, SCALE, result)
+    return np.where(x < -4 * SCALE, -SCALE, result)
+
+
+def fp_gelu_vec(x: np.ndarray) -> np.ndarray:
+    """Elementwise fp_gelu."""
+    sqrt_2_pi = 7979
+    coeff = 447
+
+    x = np.asarray(x, dtype=np.int64)
+    x_sq = (x * x) // SCALE
+    x_cu = (x_sq * x) // SCALE
+    cubic_term = (coeff * x_cu) // SCALE
+    inner = x + cubic_term
+    inner = (sqrt_2_pi * inner) // SCALE
+    tanh_val = fp_tanh_vec(inner)
+    half_term = (SCALE + tanh_val) // 2
+
+    return (x * half_term) // SCALE
+
+
+def fp_matmul(x: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """Fixed-point matmul of x[..., K] by w[K, N].
+
+    Every product is rescaled before accumulating, exactly like the AWK inner
+    loops, so this is a broadcast multiply + floor-divide + sum rather than a
+    plain `(x @ w) // SCALE` (which rounds once and drifts by up to K units).
+    Rows are processed in chunks so the [rows, K, N] temporary stays bounded.
+    """
+    rows = x.reshape(-1, x.shape[-1])
+    chunk = max(1, MATMUL_CHUNK // w.size)
+    out = np.empty((len(rows), w.shape[1]), dtype=np.int64)
+    for start in range(0, len(rows), chunk):
+        out[start:start + chunk] = (rows[start:start + chunk, :, None] * w // SCALE).sum(axis=1)
+    return out.reshape(x.shape[:-1] + (w.shape[1],))
+
+
+def fp_logits(last_hidden: np.ndarray, wte: np.ndarray) -> np.ndarray:
+    """Vocabulary logits for hidden row(s) against the tied embeddings wte[vocab_size, n_embd].
+
+    Same rounding as fp_matmul(last_hidden, wte.T), but as a matvec over wte's
+    contiguous rows instead of a broadcast through the transposed view.
+    """
+    return (wte * last_hidden[..., None, :] // SCALE).sum(axis=-1)
+
+
+def project(x: np.ndarray, weights: dict, name: str) -> np.ndarray:
+    """x @ weights[name], dequantizing per output column if quantize_weights made it int8."""
+    col_scale = weights.get(f"{name}_scale")
+    if col_scale is None:
+        return fp_matmul(x, weights[name])
+    # int8 weights, int64 accumulator: x can reach ~1e5, so int32 could overflow
+    return (x @ weights[name]) * col_scale.astype(np.int64) // (SCALE * SCALE)
+
+
+def fp_softmax(arr: np.ndarray) -> np.ndarray:
+    """Fixed-point softmax over the last axis.
+
+    The max element always contributes fp_exp(0) = SCALE, so the sum is never 0.
+    """
+    exps = fp_exp_vec(arr - arr.max(axis=-1, keepdims=True))
+    return (exps * SCALE) // exps.sum(axis=-1, keepdims=True)
+
+
+def layer_norm(inp: np.ndarray, gamma: np.ndarray, beta: np.ndarray) -> np.ndarray:
+    """Layer normalization over the last axis (one row, or every row of a matrix)."""
+    n = inp.shape[-1]
     eps = 100
 
     # Mean
-    mean = sum(inp) // n
+    mean = inp.sum(axis=-1, keepdims=True) // n
 
     # Variance
-    var_sum = sum((x - mean) ** 2 // SCALE for x in inp)
-    variance = var_sum // n
+    centered = inp - mean
+    variance = (centered * centered // SCALE).sum(axis=-1, keepdims=True) // n
 
     # Std
-    std = fp_sqrt(variance + eps)
-    if std < 100:
-        std = 100
+    std = fp_sqrt_vec(variance + eps)
+    std = np.maximum(std, 100)
 
     # Normalize
-    result = []
-    for i in range(n):
-        normalized = ((inp[i] - mean) * SCALE) // std
-        scaled = (normalized * gamma[i]) // SCALE
-        result.append(scaled + beta[i])
+    normalized = (centered * SCALE) // std
+    return (normalized * gamma) // SCALE + beta
 
-    return result
 
+def fused_add_ln(x: np.ndarray, y: np.ndarray, gamma: np.ndarray, beta: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Residual add + layer norm: returns (x + y, layer_norm(x + y)).
+
+    The sum is kept because the next residual add needs it.
+    """
+    residual = x + y
+    return residual, layer_norm(residual, gamma, beta)
 
-def multi_head_attention(hidden: list[list[int]], layer: int, config: dict, weights: dict) -> list[list[int]]:
-    """Multi-head attention."""
-    seq_len = len(hidden)
+
+def causal_attention(qkv: np.ndarray, config: dict, query_start: int = 0) -> np.ndarray:
+    """Causal attention for one sequence, from packed qkv[seq_len, 3*n_embd].
+
+    Only rows query_start.. are computed (as queries and in the output);
+    every row still contributes its key and value.
+    """
+    seq_len = len(qkv)
     n_embd = config["n_embd"]
     n_head = config["n_head"]
     head_dim = config["head_dim"]
-    qkv_dim = 3 * n_embd
+    mask = causal_mask(config["block_size"])
 
-    attn_w = weights[f"attn_w_{layer}"]
-    attn_b = weights[f"attn_b_{layer}"]
-    proj_w = weights[f"attn_proj_w_{layer}"]
-    proj_b = weights[f"attn_proj_b_{layer}"]
-
-    # Project to Q, K, V
-    qkv = []
-    for t in range(seq_len):
-        row = []
-        for i in range(qkv_dim):
-            s = attn_b[i]
-            for j in range(n_embd):
-                w_idx = j * qkv_dim + i
-                s += (hidden[t][j] * attn_w[w_idx]) // SCALE
-            row.append(s)
-        qkv.append(row)
+    # Split into [n_head, seq_len, head_dim] views (no copies). Everything below
+    # consumes them strided as-is: fp_matmul broadcasts over any layout, and a
+    # contiguous copy of K[h].T measured no faster at these sizes.
+    Q, K, V = qkv.reshape(seq_len, 3, n_head, head_dim).transpose(1, 2, 0, 3)
 
     # Compute attention for each head
     scale = fp_sqrt(head_dim * SCALE)
-    all_head_outputs = [[] for _ in range(n_head)]
+    concat = np.empty((seq_len - query_start, n_head, head_dim), dtype=np.int64)
 
     for h in range(n_head):
-        head_offset = h * head_dim
-
-        # Extract Q, K, V for this head
-        Q = [[qkv[t][head_offset + d] for d in range(head_dim)] for t in range(seq_len)]
-        K = [[qkv[t][n_embd + head_offset + d] for d in range(head_dim)] for t in range(seq_len)]
-        V = [[qkv[t][2 * n_embd + head_offset + d] for d in range(head_dim)] for t in range(seq_len)]
-
-        # Compute attention
-        for i in range(seq_len):
-            scores = []
-            for j in range(seq_len):
-                if j > i:
-                    scores.append(-1000000000)
-                else:
-                    score = sum((Q[i][d] * K[j][d]) // SCALE for d in range(head_dim))
-                    scores.append((score * SCALE) // scale)
-
+        # Causal attention, one tile of query rows at a time. Keys past a tile's
+        # last query are masked for every row in it: fp_exp(MASK - row_max)
+        # underflows to 0 for them, so they are never scored at all.
+        for start in range(query_start, seq_len, ATTN_TILE):
+            stop = min(start + ATTN_TILE, seq_len)
+            scores = (fp_matmul(Q[h, start:stop], K[h, :stop].T) * SCALE) // scale
+            scores[mask[start:stop, :stop]] = MASK
             probs = fp_softmax(scores)
 
-            # Apply to values
-            out_vec = []
-            for d in range(head_dim):
-                attn_sum = sum((probs[j] * V[j][d]) // SCALE for j in range(seq_len))
-                out_vec.append(attn_sum)
-            all_head_outputs[h].append(out_vec)
-
-    # Concatenate heads
-    concat = []
-    for t in range(seq_len):
-        row = []
-        for h in range(n_head):
-            row.extend(all_head_outputs[h][t])
-        concat.append(row)
+            # Apply to values, written straight into this head's slice of the concat
+            concat[start - query_start:stop - query_start, h] = fp_matmul(probs, V[h, :stop])
 
-    # Output projection
-    output = []
-    for t in range(seq_len):
-        row = []
-        for i in range(n_embd):
-            s = proj_b[i]
-            for j in range(n_embd):
-                w_idx = j * n_embd + i
-                s += (concat[t][j] * proj_w[w_idx]) // SCALE
-            row.append(s)
-        output.append(row)
+    return concat.reshape(-1, n_embd)
 
-    return output
+
+def multi_head_attention(hidden: np.ndarray, layer: int, config: dict, weights: dict,
+                         query_start: int = 0) -> np.ndarray:
+    """Multi-head attention: QKV projection, causal_attention() from query_start on, output projection."""
+    attn_b = weights[f"attn_b_{layer}"]
+    proj_b = weights[f"attn_proj_b_{layer}"]
+
+    # Project to Q, K, V: one [seq_len, n_embd] x [n_embd, 3*n_embd] product
+    qkv = project(hidden, weights, f"attn_w_{layer}") + attn_b
+    concat = causal_attention(qkv, config, query_start)
+
+    # Output projection
+    return project(concat, weights, f"attn_proj_w_{layer}") + proj_b
 
 
-def feed_forward(hidden: list[list[int]], layer: int, config: dict, weights: dict) -> list[list[int]]:
+def feed_forward(hidden: np.ndarray, layer: int, config: dict, weights: dict) -> np.ndarray:
     """Feed-forward network."""
-    seq_len = len(hidden)
-    n_embd = config["n_embd"]
-    hidden_dim = config["hidden_dim"]
 
-    fc1_w = weights[f"ffn_fc1_w_{layer}"]
     fc1_b = weights[f"ffn_fc1_b_{layer}"]
-    fc2_w = weights[f"ffn_fc2_w_{layer}"]
     fc2_b = weights[f"ffn_fc2_b_{layer}"]
 
-    output = []
-    for t in range(seq_len):
-        # FC1 with GELU
-        intermediate = []
-        for i in range(hidden_dim):
-            s = fc1_b[i]
-            for j in range(n_embd):
-                w_idx = j * hidden_dim + i
-                s += (hidden[t][j] * fc1_w[w_idx]) // SCALE
-            intermediate.append(fp_gelu(s))
-
-        # FC2
-        row = []
-        for i in range(n_embd):
-            s = fc2_b[i]
-            for j in range(hidden_dim):
-                w_idx = j * n_embd + i
-                s += (intermediate[j] * fc2_w[w_idx]) // SCALE
-            row.append(s)
-        output.append(row)
-
-    return output
-
-
-def transformer_block(hidden: list[list[int]], layer: int, config: dict, weights: dict) -> list[list[int]]:
-    """Single transformer block."""
-    seq_len = len(hidden)
-
-    ln1_w = weights[f"ln1_w_{layer}"]
-    ln1_b = weights[f"ln1_b_{layer}"]
-    ln2_w = weights[f"ln2_w_{layer}"]
-    ln2_b = weights[f"ln2_b_{layer}"]
-
-    # Pre-norm for attention
-    normed1 = [layer_norm(hidden[t], ln1_w, ln1_b) for t in range(seq_len)]
+    # FC1 with GELU
+    fc1_out = project(hidden, weights, f"ffn_fc1_w_{layer}") + fc1_b
+    intermediate = fp_gelu_vec(fc1_out)
 
-    # Attention
-    attn_out = multi_head_attention(normed1, layer, config, weights)
+    # FC2
+    return project(intermediate, weights, f"ffn_fc2_w_{layer}") + fc2_b
+
+
+def transformer_block(hidden: np.ndarray, pending: np.ndarray, layer: int, config: dict,
+                      weights: dict, last_only: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """Single transformer block on the input hidden + pending.
+
+    Every residual add is left to the next layer norm, so it happens in the same
+    pass: this returns (residual, ffn_out) rather than their sum.
 
-    # Residual
-    residual1 = [[hidden[t][i] + attn_out[t][i] for i in range(len(hidden[t]))] for t in range(seq_len)]
+    With last_only, only the last position is carried past the attention scores
+    (enough for the final block, whose other rows nothing reads).
+    """
+    # Residual + pre-norm for attention
+    hidden, normed1 = fused_add_ln(hidden, pending, weights[f"ln1_w_{layer}"], weights[f"ln1_b_{layer}"])
 
-    # Pre-norm for FFN
-    normed2 = [layer_norm(residual1[t], ln2_w, ln2_b) for t in range(seq_len)]
+    # Attention
+    query_start = len(hidden) - 1 if last_only else 0
+    attn_out = multi_head_attention(normed1, layer, config, weights, query_start)
+    hidden = hidden[query_start:]
+
+    # Residual + pre-norm for FFN
+    residual1, normed2 = fused_add_ln(hidden, attn_out, weights[f"ln2_w_{layer}"], weights[f"ln2_b_{layer}"])
 
     # FFN
     ffn_out = feed_forward(normed2, layer, config, weights)
 
-    # Residual
-    output = [[residual1[t][i] + ffn_out[t][i] for i in range(len(residual1[t]))] for t in range(seq_len)]
+    return residual1, ffn_out
 
-    return output
 
+def forward(tokens: list[int], config: dict, weights: dict) -> np.ndarray:
+    """Full forward pass.
 
-def forward(tokens: list[int], config: dict, weights: dict) -> list[int]:
-    """Full forward pass."""
+    Activations stay contiguous int64 [seq_len, n_embd] arrays from the
+    embedding lookup to the logits.
+    """
     seq_len = len(tokens)
     if seq_len > config["block_size"]:
         seq_len = config["block_size"]
         tokens = tokens[:seq_len]
 
-    n_embd = config["n_embd"]
-    vocab_size = config["vocab_size"]
     n_layer = config["n_layer"]
 
     wte = weights["wte"]
@@ -377,42 +498,365 @@ def forward(tokens: list[int], config: dict, weights: dict) -> list[int]:
     ln_f_w = weights["ln_f_w"]
     ln_f_b = weights["ln_f_b"]
 
-    # Token + position embeddings
-    hidden = []
-    for t, tok in enumerate(tokens):
-        tok_start = tok * n_embd
-        pos_start = t * n_embd
-        row = [wte[tok_start + i] + wpe[pos_start + i] for i in range(n_embd)]
-        hidden.append(row)
+    # Token + position embeddings, summed by the first block's ln1
+    hidden, pending = wte[tokens], wpe[:seq_len]
 
     # Transformer blocks
     for layer in range(n_layer):
-        hidden = transformer_block(hidden, layer, config, weights)
+        hidden, pending = transformer_block(hidden, pending, layer, config, weights,
+                                            last_only=(layer == n_layer - 1))
 
-    # Final layer norm (last position only)
-    last_hidden = layer_norm(hidden[-1], ln_f_w, ln_f_b)
+    # Final residual + layer norm (last position only)
+    _, last_hidden = fused_add_ln(hidden[-1], pending[-1], ln_f_w, ln_f_b)
 
-    # Project to vocabulary
-    logits = []
-    for v in range(vocab_size):
-        emb_start = v * n_embd
-        s = sum((last_hidden[i] * wte[emb_start + i]) // SCALE for i in range(n_embd))
-        logits.append(s)
+    # Project to vocabulary (weight-tied with the token embeddings)
+    logits = fp_logits(last_hidden, wte)
 
     return logits
 
 
+def forward_batch(tokens_batch: list[list[int]], config: dict, weights: dict) -> np.ndarray:
+    """Logits for several prompts: logits[batch, vocab_size], one forward() per prompt.
+
+    Padding the prompts into one [batch, seq_len] pass buys nothing here:
+    fp_matmul is a broadcast multiply rather than a GEMM, so there is no
+    weight traffic to share, and padded rows are extra work. Measured, it was
+    slower than this loop at every batch size tried.
+    """
+    if not all(tokens_batch):
+        raise ValueError("every prompt needs at least one token")
+    return np.stack([forward(tokens, config, weights) for tokens in tokens_batch])
+
+
+class Session:
+    """Incremental decoding over a KV cache: feed one token per step() and get its logits.
+
+    K/V caches for every layer are allocated once for block_size positions.
+    Step pos only computes row pos, attending over the cached keys and values
+    0..pos, so a step costs O(pos) instead of a full O(pos^2) forward() while
+    returning exactly forward(tokens[:pos + 1]). The caches are the only state
+    kept between steps: each step's activations are NumPy temporaries, as in
+    forward().
+    """
+
+    def __init__(self, config: dict, weights: dict):
+        self.config = config
+        self.weights = weights
+        cache_shape = (config["n_layer"], config["n_head"], config["block_size"], config["head_dim"])
+        self.k_cache = np.empty(cache_shape, dtype=np.int64)
+        self.v_cache = np.empty(cache_shape, dtype=np.int64)
+        self.scale = fp_sqrt(config["head_dim"] * SCALE)
+        self.pos = 0
+
+    def step(self, token: int) -> np.ndarray:
+        """Append token at the next position and return the logits after it."""
+        config = self.config
+        weights = self.weights
+        pos = self.pos
+        if pos >= config["block_size"]:
+            raise ValueError(f"session is full ({config['block_size']} tokens)")
+
+        n_head = config["n_head"]
+        head_dim = config["head_dim"]
+        concat = np.empty((n_head, head_dim), dtype=np.int64)
+
+        # Token + position embedding rows, summed by the first block's ln1
+        hidden, pending = weights["wte"][token], weights["wpe"][pos]
+
+        for layer in range(config["n_layer"]):
+            # Residual + pre-norm, then Q/K/V for this row only
+            hidden, normed1 = fused_add_ln(hidden, pending, weights[f"ln1_w_{layer}"], weights[f"ln1_b_{layer}"])
+            qkv = project(normed1, weights, f"attn_w_{layer}") + weights[f"attn_b_{layer}"]
+            q, k, v = qkv.reshape(3, n_head, head_dim)
+            self.k_cache[layer, :, pos] = k
+            self.v_cache[layer, :, pos] = v
+
+            # Attend over positions 0..pos (nothing to mask)
+            for h in range(n_head):
+                scores = (fp_matmul(q[h], self.k_cache[layer, h, :pos + 1].T) * SCALE) // self.scale
+                concat[h] = fp_matmul(fp_softmax(scores), self.v_cache[layer, h, :pos + 1])
+            attn_out = project(concat.reshape(-1), weights, f"attn_proj_w_{layer}") + weights[f"attn_proj_b_{layer}"]
+
+            # Residual + FFN
+            hidden, normed2 = fused_add_ln(hidden, attn_out, weights[f"ln2_w_{layer}"], weights[f"ln2_b_{layer}"])
+            pending = feed_forward(normed2, layer, config, weights)
+
+        _, last_hidden = fused_add_ln(hidden, pending, weights["ln_f_w"], weights["ln_f_b"])
+        self.pos += 1
+        return fp_logits(last_hidden, weights["wte"])
+
+
+def forward_kernels(tokens: list[int], config: dict, weights: dict, kernels: tuple) -> np.ndarray:
+    """Full forward pass on a kernel set shaped like forward_numba.NUMBA_KERNELS. Same logits as forward()."""
+    add_layer_norm, linear, attention, feed_forward = kernels
+    tokens = tokens[:config["block_size"]]
+    seq_len = len(tokens)
+    if seq_len == 0:
+        # Neither kernel set bounds-checks: the last block's q_start would be -1
+        raise ValueError("forward_kernels needs at least one token")
+    n_embd = config["n_embd"]
+    n_head = config["n_head"]
+
+    # Scratch buffers, allocated once and reused by every layer.
+    # pending is added to hidden by the next add_layer_norm: the position
+    # embeddings first, then each block's FFN output.
+    hidden = weights["wte"][tokens]
+    pending = np.ascontiguousarray(weights["wpe"][:seq_len])
+    normed = np.empty((seq_len, n_embd), dtype=np.int64)
+    qkv = np.empty((seq_len, 3 * n_embd), dtype=np.int64)
+    attn_concat = np.empty((seq_len, n_embd), dtype=np.int64)
+    attn_out = np.empty((seq_len, n_embd), dtype=np.int64)
+    ffn_out = np.empty((seq_len, n_embd), dtype=np.int64)
+    ffn_intermediate = np.empty((seq_len, config["hidden_dim"]), dtype=np.int64)
+
+    scale = fp_sqrt(config["head_dim"] * SCALE)
+
+    n_layer = config["n_layer"]
+    for layer in range(n_layer):
+        # The last block only needs its last row past the attention scores
+        rows = slice(seq_len - 1, seq_len) if layer == n_layer - 1 else slice(0, seq_len)
+
+        # Residual + attention
+        add_layer_norm(hidden, pending, weights[f"ln1_w_{layer}"], weights[f"ln1_b_{layer}"], normed)
+        linear(normed, weights[f"attn_w_{layer}"], weights[f"attn_b_{layer}"], qkv)
+        attention(qkv, n_head, scale, EXP_TABLE, rows.start, attn_concat[rows])
+        linear(attn_concat[rows], weights[f"attn_proj_w_{layer}"], weights[f"attn_proj_b_{layer}"], attn_out[rows])
+
+        # Residual + FFN
+        add_layer_norm(hidden[rows], attn_out[rows], weights[f"ln2_w_{layer}"], weights[f"ln2_b_{layer}"],
+                       normed[rows])
+        feed_forward(normed[rows], weights[f"ffn_fc1_w_{layer}"], weights[f"ffn_fc1_b_{layer}"],
+                     weights[f"ffn_fc2_w_{layer}"], weights[f"ffn_fc2_b_{layer}"],
+                     ffn_intermediate[rows], ffn_out[rows])
+        pending = ffn_out
+
+    _, last_hidden = fused_add_ln(hidden[-1], pending[-1], weights["ln_f_w"], weights["ln_f_b"])
+    return fp_logits(last_hidden, weights["wte"])
+
+
+def forward_numba(tokens: list[int], config: dict, weights: dict) -> np.ndarray:
+    """Full forward pass on the Numba kernels (imports numba on first use)."""
+    from forward_numba import NUMBA_KERNELS
+    return forward_kernels(tokens, config, weights, NUMBA_KERNELS)
+
+
+# Native kernels: forward_kernel.c compiled with the model shapes as constants,
+# once per shape, and called through ctypes.
+
+NATIVE_SOURCE = Path(__file__).with_name("forward_kernel.c")
+
+
+def load_native_kernels(config: dict) -> tuple:
+    """Build (or reuse) forward_kernel.c for this config and wrap it like forward_numba.NUMBA_KERNELS."""
+    n_embd = config["n_embd"]
+    n_head = config["n_head"]
+    hidden_dim = config["hidden_dim"]
+
+    lib_path = NATIVE_SOURCE.parent / "build" / f"forward_kernel_{n_embd}_{n_head}_{hidden_dim}.so"
+    if not lib_path.exists() or lib_path.stat().st_mtime < NATIVE_SOURCE.stat().st_mtime:
+        lib_path.parent.mkdir(exist_ok=True)
+        # Build under a private name and rename into place, so a concurrent
+        # run never loads a half-written library
+        tmp_path = lib_path.with_name(f"{lib_path.name}.{os.getpid()}.tmp")
+        try:
+            subprocess.run([
+                os.environ.get("CC", "cc"), "-O3", "-march=native", "-shared", "-fPIC",
+                f"-DN_EMBD={n_embd}", f"-DN_HEAD={n_head}", f"-DHIDDEN_DIM={hidden_dim}",
+                str(NATIVE_SOURCE), "-o", str(tmp_path),
+            ], check=True)
+            os.replace(tmp_path, lib_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    lib = ctypes.CDLL(str(lib_path))
+    arr = np.ctypeslib.ndpointer(dtype=np.int64, flags="C_CONTIGUOUS")
+    i64 = ctypes.c_int64
+    lib.add_layer_norm.argtypes = [arr, arr, arr, arr, arr, i64]
+    lib.linear_qkv.argtypes = [arr, arr, arr, arr, i64]
+    lib.linear_proj.argtypes = [arr, arr, arr, arr, i64]
+    lib.attention.argtypes = [arr, i64, i64, arr, i64, arr]
+    lib.feed_forward.argtypes = [arr, arr, arr, arr, arr, arr, arr, i64]
+
+    linears = {(n_embd, 3 * n_embd): lib.linear_qkv, (n_embd, n_embd): lib.linear_proj}
+
+    def add_layer_norm(hidden, pending, gamma, beta, out):
+        lib.add_layer_norm(hidden, pending, gamma, beta, out, len(hidden))
+
+    def linear(x, w, b, out):
+        linears[w.shape](x, w, b, out, len(x))
+
+    def attention(qkv, n_head, scale, exp_table, q_start, out):
+        lib.attention(qkv, len(qkv), scale, exp_table, q_start, out)
+
+    def feed_forward(x, fc1_w, fc1_b, fc2_w, fc2_b, intermediate, out):
+        lib.feed_forward(x, fc1_w, fc1_b, fc2_w, fc2_b, intermediate, out, len(x))
+
+    return add_layer_norm, linear, attention, feed_forward
+
+
+def forward_native(tokens: list[int], config: dict, weights: dict) -> np.ndarray:
+    """Full forward pass on the shape-specialized C kernels."""
+    return forward_kernels(tokens, config, weights, load_native_kernels(config))
+
+
+# Float fast path: float32 weights and BLAS matmuls. Not bit-exact with the AWK
+# version (or the paths above); only layer norms run in fixed point.
+
+def float_weights(weights: dict) -> dict:
+    """float32 copy of weights in real units. Layer norm parameters stay fixed-point."""
+    return {
+        name: w if name.startswith("ln") else w.astype(np.float32) / SCALE
+        for name, w in weights.items()
+    }
+
+
+def fast_layer_norm(x: np.ndarray, gamma: np.ndarray, beta: np.ndarray) -> np.ndarray:
+    """layer_norm with fixed-point mean/variance, on x rounded to fixed point and back."""
+    fixed = np.rint(x * SCALE).astype(np.int64)
+    return layer_norm(fixed, gamma, beta).astype(np.float32) / SCALE
+
+
+def forward_fast(tokens: list[int], config: dict, weights: dict) -> np.ndarray:
+    """Float32 forward pass on float_weights(); logits are rounded back to fixed point."""
+    tokens = tokens[:config["block_size"]]
+    seq_len = len(tokens)
+    n_embd = config["n_embd"]
+    n_head = config["n_head"]
+    head_dim = config["head_dim"]
+    mask = causal_mask(config["block_size"])[:seq_len, :seq_len]
+
+    hidden = weights["wte"][tokens] + weights["wpe"][:seq_len]
+
+    for layer in range(config["n_layer"]):
+        # Attention
+        normed = fast_layer_norm(hidden, weights[f"ln1_w_{layer}"], weights[f"ln1_b_{layer}"])
+        qkv = normed @ weights[f"attn_w_{layer}"] + weights[f"attn_b_{layer}"]
+        Q, K, V = qkv.reshape(seq_len, 3, n_head, head_dim).transpose(1, 2, 0, 3)
+
+        scores = (Q @ K.transpose(0, 2, 1)) * head_dim ** -0.5
+        scores[:, mask] = -np.inf
+        probs = np.exp(scores - scores.max(axis=-1, keepdims=True))
+        probs /= probs.sum(axis=-1, keepdims=True)
+
+        attn = (probs @ V).transpose(1, 0, 2).reshape(seq_len, n_embd)
+        hidden = hidden + attn @ weights[f"attn_proj_w_{layer}"] + weights[f"attn_proj_b_{layer}"]
+
+        # FFN (tanh GELU, as in fp_gelu)
+        normed = fast_layer_norm(hidden, weights[f"ln2_w_{layer}"], weights[f"ln2_b_{layer}"])
+        fc1_out = normed @ weights[f"ffn_fc1_w_{layer}"] + weights[f"ffn_fc1_b_{layer}"]
+        gelu = 0.5 * fc1_out * (1 + np.tanh(0.7978845608 * (fc1_out + 0.044715 * fc1_out ** 3)))
+        hidden = hidden + gelu @ weights[f"ffn_fc2_w_{layer}"] + weights[f"ffn_fc2_b_{layer}"]
+
+    last_hidden = fast_layer_norm(hidden[-1], weights["ln_f_w"], weights["ln_f_b"])
+    return np.rint(last_hidden @ weights["wte"].T * SCALE).astype(np.int64)
+
+
+def check_backends(prompts: list[list[int]], config: dict, weights: dict) -> bool:
+    """Compare every bit-exact backend against forward() on prompts; print one line per backend.
+
+    Backends whose dependency is missing (numba, a C compiler) are reported
+    as skipped rather than failed. --int8 and --fast are lossy and not checked.
+    """
+    expected = [forward(tokens, config, weights) for tokens in prompts]
+
+    def session_logits(tokens):
+        # Every step must match forward() on the prefix so far
+        session = Session(config, weights)
+        for pos, token in enumerate(tokens[:config["block_size"]]):
+            logits = session.step(token)
+            if not np.array_equal(logits, forward(tokens[:pos + 1], config, weights)):
+                return None
+        return logits
+
+    backends = {
+        "batch": lambda: list(forward_batch(prompts, config, weights)),
+        "incremental": lambda: [session_logits(tokens) for tokens in prompts],
+    }
+    try:
+        import numba  # noqa: F401
+        backends["numba"] = lambda: [forward_numba(tokens, config, weights) for tokens in prompts]
+    except ImportError:
+        print("skip numba: numba is not installed")
+    try:
+        native = load_native_kernels(config)
+        backends["native"] = lambda: [forward_kernels(tokens, config, weights, native) for tokens in prompts]
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"skip native: {e}")
+
+    all_ok = True
+    for name, run in backends.items():
+        mismatches = [
+            i for i, (got, want) in enumerate(zip(run(), expected))
+            if got is None or not np.array_equal(got, want)
+        ]
+        all_ok &= not mismatches
+        status = f"MISMATCH on prompts {mismatches}" if mismatches else "ok"
+        print(f"{name}: {status} ({len(prompts)} prompts)")
+    return all_ok
+
+
 def main():
     parser = argparse.ArgumentParser(description="Python reference transformer forward pass")
     parser.add_argument("--model-dir", default="model", help="Model directory")
-    parser.add_argument("--tokens", default="72 101 108 108 111", help="Space-separated token IDs")
+    parser.add_argument("--tokens", default="72 101 108 108 111",
+                        help="Space-separated token IDs; separate prompts with commas to batch them")
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument("--numba", action="store_true", help="Run the forward pass on the Numba kernels")
+    backend.add_argument("--native", action="store_true", help="Run the forward pass on shape-specialized C kernels")
+    backend.add_argument("--fast", action="store_true", help="Float32 BLAS forward pass (lossy)")
+    backend.add_argument("--incremental", action="store_true",
+                         help="Feed the tokens one at a time through a KV-cached Session")
+    parser.add_argument("--int8", action="store_true", help="Int8 block weights (lossy, NumPy path only)")
+    parser.add_argument("--check", action="store_true",
+                        help="Check every bit-exact backend against the NumPy path on --tokens, "
+                             "a single token and an over-long prompt; exits 1 on any mismatch")
     args = parser.parse_args()
 
+    if args.numba:
+        try:
+            import numba  # noqa: F401
+        except ImportError:
+            parser.error("--numba needs numba (pip install numba)")
+    if args.int8 and (args.numba or args.native or args.fast):
+        parser.error("--int8 is only supported on the NumPy path")
+    if args.check and (args.numba or args.native or args.fast or args.incremental or args.int8):
+        parser.error("--check runs every exact backend itself; drop the backend flags")
+
     model_dir = Path(args.model_dir)
-    tokens = [int(t) for t in args.tokens.split()]
+    prompts = [[int(t) for t in prompt.split()] for prompt in args.tokens.split(",")]
+    if not all(prompts):
+        parser.error("every prompt in --tokens needs at least one token")
+    if len(prompts) > 1 and (args.numba or args.native or args.fast or args.incremental):
+        parser.error("batched prompts are only supported on the NumPy path")
+    tokens = prompts[0]
 
     config, weights = load_model(model_dir)
-    logits = forward(tokens, config, weights)
+    if args.check:
+        # Add the edge cases: one token, and more than block_size (truncated)
+        long_prompt = [(7 * i) % config["vocab_size"] for i in range(config["block_size"] + 6)]
+        sys.exit(0 if check_backends(prompts + [[prompts[0][0]], long_prompt], config, weights) else 1)
+    if args.int8:
+        weights = quantize_weights(weights, config)
+    if len(prompts) > 1:
+        for logits in forward_batch(prompts, config, weights):
+            print(" ".join(str(l) for l in logits))
+        return
+    if args.numba:
+        logits = forward_numba(tokens, config, weights)
+    elif args.native:
+        try:
+            kernels = load_native_kernels(config)
+        except (OSError, subprocess.CalledProcessError) as e:
+            parser.error(f"--native needs a working C compiler (cc, or $CC): {e}")
+        logits = forward_kernels(tokens, config, weights, kernels)
+    elif args.fast:
+        logits = forward_fast(tokens, config, float_weights(weights))
+    elif args.incremental:
+        session = Session(config, weights)
+        for token in tokens[:config["block_size"]]:
+            logits = session.step(token)
+    else:
+        logits = forward(tokens, config, weights)
 
     print(" ".join(str(l) for l in logits))
 
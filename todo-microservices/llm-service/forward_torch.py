@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Transformer Forward Pass - PyTorch
+Serves the trained checkpoint directly: no fixed-point export, no Taylor series,
+one MKL/cuBLAS call per matmul. Uses CUDA when it's there.
+
+Not bit-exact with anything. forward_reference.py stays the parity check for the
+AWK version; this is the "what if we just used the GPU" path.
+
+Usage:
+    python forward_torch.py --model-dir model --tokens "72 101 108 108 111"
+
+Outputs last-position logits in the same fixed-point format as the AWK version.
+Needs model/model.pt, which train_model.py writes next to the text weights.
+
+Requirements:
+    pip install torch
+"""
+
+import argparse
+from pathlib import Path
+
+import torch
+
+from train_model import BLOCK_SIZE, SCALE, TinyGPT
+
+
+def load_model(model_dir: Path, device: torch.device) -> TinyGPT:
+    """Load the model.pt state dict onto device, in eval mode."""
+    model = TinyGPT()
+    model.load_state_dict(torch.load(model_dir / "model.pt", map_location=device))
+    return model.to(device).eval()
+
+
+@torch.inference_mode()
+def forward(model: TinyGPT, tokens: list[int], device: torch.device) -> list[int]:
+    """Full forward pass, returning the last position's logits in fixed point."""
+    idx = torch.tensor([tokens[:BLOCK_SIZE]], dtype=torch.long, device=device)
+    logits, _ = model(idx)
+    return (logits[0, -1] * SCALE).round().long().tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyTorch transformer forward pass")
+    parser.add_argument("--model-dir", default="model", help="Model directory")
+    parser.add_argument("--tokens", default="72 101 108 108 111", help="Space-separated token IDs")
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    tokens = [int(t) for t in args.tokens.split()]
+
+    model = load_model(Path(args.model_dir), device)
+    logits = forward(model, tokens, device)
+
+    print(" ".join(str(l) for l in logits))
+
+
+if __name__ == "__main__":
+    main()
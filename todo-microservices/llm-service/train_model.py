@@ -11,12 +11,13 @@ Usage:
     python train_model.py --iters 5000       # More training iterations
 
 Requirements:
-    pip install torch
+    pip install torch numpy
 """
 
 import os
 import math
 import argparse
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -168,28 +169,14 @@ def export_weights(model, output_dir):
         f.write(f"block_size={BLOCK_SIZE}\n")
 
     # Token embeddings [vocab_size, n_embd]
-    wte = to_fixed_point(model.wte.weight.data)
-    with open(f"{output_dir}/wte.txt", "w") as f:
-        for row in wte:
-            for val in row:
-                f.write(f"{val.item()}\n")
+    write_matrix(to_fixed_point(model.wte.weight.data), f"{output_dir}/wte.txt")
 
     # Position embeddings [block_size, n_embd]
-    wpe = to_fixed_point(model.wpe.weight.data)
-    with open(f"{output_dir}/wpe.txt", "w") as f:
-        for row in wpe:
-            for val in row:
-                f.write(f"{val.item()}\n")
+    write_matrix(to_fixed_point(model.wpe.weight.data), f"{output_dir}/wpe.txt")
 
     # Final layer norm
-    ln_f_w = to_fixed_point(model.ln_f.weight.data)
-    ln_f_b = to_fixed_point(model.ln_f.bias.data)
-    with open(f"{output_dir}/ln_f_weight.txt", "w") as f:
-        for val in ln_f_w:
-            f.write(f"{val.item()}\n")
-    with open(f"{output_dir}/ln_f_bias.txt", "w") as f:
-        for val in ln_f_b:
-            f.write(f"{val.item()}\n")
+    write_tensor(to_fixed_point(model.ln_f.weight.data), f"{output_dir}/ln_f_weight.txt")
+    write_tensor(to_fixed_point(model.ln_f.bias.data), f"{output_dir}/ln_f_bias.txt")
 
     # Per-layer weights
     for i, block in enumerate(model.blocks):
@@ -220,20 +207,19 @@ def export_weights(model, output_dir):
         write_matrix(to_fixed_point(block.mlp.c_proj.weight.data.T), f"{block_dir}/ffn_fc2_weight.txt")
         write_tensor(to_fixed_point(block.mlp.c_proj.bias.data), f"{block_dir}/ffn_fc2_bias.txt")
 
+    # Float checkpoint for forward_torch.py (skips the fixed-point round trip)
+    torch.save(model.state_dict(), f"{output_dir}/model.pt")
+
     print(f"Weights exported to {output_dir}/")
 
 
 def write_tensor(tensor, path):
-    with open(path, "w") as f:
-        for val in tensor.flatten():
-            f.write(f"{val.item()}\n")
+    """One integer per line, row-major (what the AWK loader reads)."""
+    np.savetxt(path, tensor.cpu().numpy().ravel(), fmt="%d")
 
 
 def write_matrix(tensor, path):
-    with open(path, "w") as f:
-        for row in tensor:
-            for val in row:
-                f.write(f"{val.item()}\n")
+    write_tensor(tensor, path)
 
 
 # === Sample training data ===